@@ -3,37 +3,44 @@
 
 """Provides a wrapper around a file."""
 
-from io import BufferedReader, SEEK_END, SEEK_SET
+import mmap
+from io import BufferedReader
 
 class FileBuffer:
     """Basically a file."""
     file: BufferedReader
-    _len: int | None = None
+    mm: mmap.mmap | None = None
+    _mv: memoryview
+    _len: int
 
     def __init__(self, file: BufferedReader) -> None:
         self.file = file
 
-    def __len__(self) -> int:
-        """Get length of buffer."""
-        if self._len is None:
-            # save current position
-            orig_pos: int = self.file.tell()
+        try:
+            self.mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mv = memoryview(self.mm)
+        except ValueError:
+            # empty files can't be mapped
+            self._mv = memoryview(b'')
 
-            # go to end of buffer and get offset
-            self._len = self.file.seek(0, SEEK_END)
-
-            # return to original position
-            self.file.seek(orig_pos, SEEK_SET)
+        self._len = len(self._mv)
 
+    def __len__(self) -> int:
+        """Get length of buffer."""
         return self._len
 
 
     def read(self, offset: int, size: int) -> bytes:
         """Read given number of bytes from buffer at offset."""
-        if offset >= 0:
-            self.file.seek(offset, SEEK_SET)
-        else:
+        if offset < 0:
             # negative offsets are relative to end of file
-            self.file.seek(offset, SEEK_END)
+            offset += self._len
+
+        return bytes(self._mv[offset:offset + size])
+
+    def close(self) -> None:
+        """Unmap the file."""
+        self._mv.release()
 
-        return self.file.read(size)
+        if self.mm is not None:
+            self.mm.close()
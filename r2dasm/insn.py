@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import re
-from typing import Final
+from typing import Callable, Final
 
 
 INSN_LENGTH_IDX: Final[list[int]] = [
@@ -16,12 +16,20 @@ INSN_LENGTH_IDX: Final[list[int]] = [
     4, # 0b111 (7) -> 4 bytes
 ]
 
+# instruction length indexed by the whole first byte
+INSN_LENGTH_TAB: Final[bytes] = bytes(INSN_LENGTH_IDX[b >> 5] for b in range(256))
+
 # 'x', 'y' are made-up placeholders
 VALID_ARGS: Final[set[str]] = {'a', 'b', 'd', 'i', 'j', 'k', 'n', 'x', 'y'}
 
+# format directive: optional 'r' (register) prefix, '%', arg letter
+_FMT_RE: Final[re.Pattern[str]] = re.compile(r'(r?)%(.)')
+
 class BitRange:
     """A range of bits."""
 
+    __slots__ = ('length', 'insn_offset', 'value_offset')
+
     length: int
     """Number of bits in this range."""
     insn_offset: int
@@ -41,12 +49,61 @@ class BitRange:
         return value << self.value_offset
 
 
+# BitRange lists by (arg, masked operand template); templates are constant, so parse each once
+_RANGE_CACHE: Final[dict[tuple[str, str], list[BitRange]]] = {}
+
+def parse_ranges(arg: str, template: str) -> list[BitRange]:
+    """Find the runs of arg in template, from LSB to MSB."""
+    key: tuple[str, str] = (arg, template)
+
+    if key in _RANGE_CACHE:
+        return _RANGE_CACHE[key]
+
+    template_len: int = len(template)
+
+    ranges: list[BitRange] = []
+
+    value_offset: int = 0
+    search_index: int = template_len
+
+    while search_index != -1:
+        assert search_index >= 0
+
+        lsb_index: int = template.rfind(arg, 0, search_index)
+
+        if lsb_index == -1:
+            # no more bits
+            break
+
+        # this works even if -1 is returned, because then the MSB is at index 0
+        msb_index: int = template.rfind('-', 0, lsb_index) + 1
+
+        run_length: int = lsb_index - msb_index + 1
+        lsb_offset: int = template_len - lsb_index - 1
+
+        ranges.append(BitRange(run_length, lsb_offset, value_offset))
+
+        value_offset += run_length
+        search_index = msb_index - 1
+
+    _RANGE_CACHE[key] = ranges
+
+    return ranges
+
+
 class R2OperandTempl:
+    __slots__ = ('arg', 'template', 'mask', 'signed', 'bit_length', 'ranges', 'range_tuples', 'single')
+
     arg: str
+    template: str
     mask: int
-    signed: bool = False
+    signed: bool
     bit_length: int
     ranges: list[BitRange]
+    range_tuples: tuple[tuple[int, int, int], ...]
+    """ranges flattened to (insn_offset, mask, value_offset)."""
+    single: tuple[int, int] | None
+    """(insn_offset, mask) if there is exactly one range starting at value bit 0."""
 
     def __init__(self, arg: str, template: str, *, signed: bool = False):
         assert arg in VALID_ARGS
@@ -58,80 +115,56 @@ class R2OperandTempl:
 
         self.template = ''.join(arg if ch == arg else '-' for ch in template_lower)
 
-        template_len: int = len(self.template)
+        self.mask = 0
 
-        self.mask = int(''.join('1' if ch == arg else '0' for ch in self.template), 2)
+        ch: str
+        for ch in self.template:
+            self.mask = (self.mask << 1) | int(ch == arg)
 
         self.bit_length = template.count(arg)
 
         self.signed = signed
 
-        self.ranges = []
-
-        value_offset: int = 0
-        search_index: int = template_len
-
-        while search_index != -1:
-            assert search_index >= 0
-
-            lsb_index: int = self.template.rfind(arg, 0, search_index)
+        self.ranges = parse_ranges(arg, self.template)
 
-            if lsb_index == -1:
-                # no more bits
-                break
+        self.range_tuples = tuple((r.insn_offset, (1 << r.length) - 1, r.value_offset) for r in self.ranges)
 
-            # this works even if -1 is returned, because then the MSB is at index 0
-            msb_index: int = self.template.rfind('-', 0, lsb_index) + 1
-
-            run_length: int = lsb_index - msb_index + 1
-            lsb_offset: int = template_len - lsb_index - 1
-
-            self.ranges.append(BitRange(run_length, lsb_offset, value_offset))
-
-            value_offset += run_length
-            search_index = msb_index - 1
+        if len(self.range_tuples) == 1:
+            (insn_offset, mask, _) = self.range_tuples[0]
+            self.single = (insn_offset, mask)
+        else:
+            self.single = None
 
 
-    def extract(self, instruction: int) -> 'R2Operand':
+    def extract(self, instruction: int) -> int:
         """Decode the value of this operand from instruction."""
         assert self.bit_length > 0
 
-        value: int = 0
+        value: int
+
+        if self.single is not None:
+            # common case: operand is one contiguous run of bits
+            (shift, range_mask) = self.single
+            value = (instruction >> shift) & range_mask
+        else:
+            value = 0
 
-        for bit_range in self.ranges:
-            value |= bit_range.extract_part(instruction)
+            for (insn_offset, range_mask, value_offset) in self.range_tuples:
+                value |= ((instruction >> insn_offset) & range_mask) << value_offset
 
         if self.signed:
-            # check if value is negative
+            # sign-extend without branching on the sign bit
             sign_bit: int = 1 << (self.bit_length - 1)
 
-            if (value & sign_bit) != 0:
-                # invert value
-                mask: int = (1 << self.bit_length) - 1
-
-                value ^= mask
-                value += 1
-                value = -value
-
-        return R2Operand(self, value)
-
-
-class R2Operand:
-    arg: str
-    signed: bool
-    bit_length: int
-    value: int
-    template: R2OperandTempl
+            value = (value ^ sign_bit) - sign_bit
 
-    def __init__(self, template: R2OperandTempl, value: int):
-        self.template = template
-        self.arg = template.arg
-        self.bit_length = template.bit_length
-        self.signed = template.signed
+        return value
 
-        self.value = value
 
 class R2InsnTempl:
+    __slots__ = ('mnemonic', 'length', 'length_bits', 'bits', 'mask', 'bits_template', 'args', 'opr_templates',
+                 'arg_slot', 'opr_list', 'args_format', 'fmt_parts', 'signed_args')
+
     mnemonic: str
     length: int
     length_bits: int
@@ -140,7 +173,13 @@ class R2InsnTempl:
     bits_template: str
     args: set[str]
     opr_templates: dict[str, R2OperandTempl]
+    arg_slot: dict[str, int]
+    """Index of each arg in R2Insn.args."""
+    opr_list: tuple[R2OperandTempl, ...]
+    """Operand templates in arg_slot order."""
     args_format: str
+    fmt_parts: list[tuple[str, int | None, bool]]
+    """Pre-parsed args_format as (literal, slot, is_reg); slot is None for trailing text."""
     signed_args: set[str]
 
     def __init__(self, mnemonic: str, length: int, bits_template: str, args_format: str | None = None, *,
@@ -186,21 +225,68 @@ class R2InsnTempl:
         for arg in self.args:
             self.opr_templates[arg] = R2OperandTempl(arg, self.bits_template, signed=arg in self.signed_args)
 
-        self.bits = int(''.join(ch if ch in {'0', '1'} else '0' for ch in self.bits_template), 2)
-        self.mask = int(''.join('1' if ch in {'0', '1'} else '0' for ch in self.bits_template), 2)
+        self.arg_slot = {arg: slot for (slot, arg) in enumerate(sorted(self.args))}
+        self.opr_list = tuple(self.opr_templates[arg] for arg in sorted(self.args))
+
+        self.fmt_parts = self.parse_format(self.args_format)
+
+        self.bits = 0
+        self.mask = 0
+
+        ch: str
+        for ch in self.bits_template:
+            self.bits <<= 1
+            self.mask <<= 1
+
+            if ch == '1':
+                self.bits |= 1
+                self.mask |= 1
+            elif ch == '0':
+                self.mask |= 1
+
+    def parse_format(self, args_format: str) -> list[tuple[str, int | None, bool]]:
+        """Split an args format string into literal text and arg directives."""
+        parts: list[tuple[str, int | None, bool]] = []
+
+        literal: str = ''
+        pos: int = 0
+
+        match: re.Match[str]
+        for match in _FMT_RE.finditer(args_format):
+            literal += args_format[pos:match.start()]
+            pos = match.end()
+
+            arg: str = match.group(2)
+
+            # for escaping %
+            if arg == '%':
+                literal += '%'
+                continue
+
+            assert arg in VALID_ARGS
+            assert arg in self.args
+
+            parts.append((literal, self.arg_slot[arg], match.group(1) == 'r'))
+            literal = ''
+
+        parts.append((literal + args_format[pos:], None, False))
+
+        return parts
 
     def match(self, instruction: int) -> bool:
         """Check whether an instruction matches this template."""
         return (instruction & self.mask) == self.bits
 
     def parse(self, instruction: int) -> 'R2Insn':
-        """Decode an instruction using this template."""
-        args: dict[str, R2Operand] = {}
+        """Decode an instruction using this template.
 
-        for (arg, templ) in self.opr_templates.items():
-            args[arg] = templ.extract(instruction)
+        Operands are not extracted until R2Insn.args is first accessed.
+        """
+        return R2Insn(self.length, instruction, self)
 
-        return R2Insn(self.length, instruction, self, args)
+    def extract_args(self, instruction: int) -> tuple[int, ...]:
+        """Decode all operand values of an instruction, in arg_slot order."""
+        return tuple(templ.extract(instruction) for templ in self.opr_list)
 
 INSNS: list[R2InsnTempl] = [
     # 16-bit / 2-byte / "BT"?
@@ -262,47 +348,175 @@ INSNS: list[R2InsnTempl] = [
     R2InsnTempl('l.syncwritebuffer', 4, '11110100000000000000000000000101'),                 # disasm
 ]
 
+# templates bucketed by instruction length, preserving INSNS order
+INSNS_BY_LEN: Final[list[list[R2InsnTempl]]] = [
+    [templ for templ in INSNS if templ.length == length] for length in range(max(INSN_LENGTH_IDX) + 1)
+]
+
+class DecodeNode:
+    """A node in a decision tree over fixed instruction bits."""
+    __slots__ = ('bit', 'zero', 'one', 'templates')
+
+    bit: int | None
+    """Bit tested at this node, counted from the LSB; None for leaves."""
+    zero: 'DecodeNode | None'
+    one: 'DecodeNode | None'
+    templates: list[R2InsnTempl]
+    """Candidate templates at a leaf, in INSNS order."""
+
+    def __init__(self, templates: list[R2InsnTempl], bit: int | None = None,
+                 zero: 'DecodeNode | None' = None, one: 'DecodeNode | None' = None):
+        self.templates = templates
+        self.bit = bit
+        self.zero = zero
+        self.one = one
+
+
+def build_tree(templates: list[R2InsnTempl], length_bits: int) -> DecodeNode:
+    """Build a decision tree that narrows templates down by testing one fixed bit at a time.
+
+    Templates that don't care about the tested bit go down both sides, so every template that
+    could match a word is in the leaf it reaches, and leaves keep INSNS order.
+    """
+    if len(templates) <= 1:
+        return DecodeNode(templates)
+
+    best: tuple[int, int, int] | None = None
+    best_split: tuple[list[R2InsnTempl], list[R2InsnTempl]] = ([], [])
+
+    bit: int
+    for bit in range(length_bits - 1, -1, -1):
+        zero: list[R2InsnTempl] = []
+        one: list[R2InsnTempl] = []
+
+        templ: R2InsnTempl
+        for templ in templates:
+            fixed: bool = bool((templ.mask >> bit) & 1)
+            value: int = (templ.bits >> bit) & 1
+
+            if not fixed or value == 0:
+                zero.append(templ)
+            if not fixed or value == 1:
+                one.append(templ)
+
+        # prefer the most even split, then the fewest duplicated templates, then higher bits
+        score: tuple[int, int, int] = (max(len(zero), len(one)), len(zero) + len(one), -bit)
+
+        if best is None or score < best:
+            best = score
+            best_split = (zero, one)
+
+    assert best is not None
+
+    if best[0] >= len(templates):
+        # no bit separates these templates; try them in order
+        return DecodeNode(templates)
+
+    (zero_templates, one_templates) = best_split
+
+    return DecodeNode(templates, -best[2],
+                      build_tree(zero_templates, length_bits), build_tree(one_templates, length_bits))
+
+# decision trees by length
+DECODE_TREES: Final[list[DecodeNode]] = [
+    build_tree(templates, length * 8) for (length, templates) in enumerate(INSNS_BY_LEN)
+]
+
+def gen_decoder(length: int) -> Callable[[int], R2InsnTempl | None]:
+    """Generate a function mapping an instruction word of the given length to its template.
+
+    The function is straight-line Python compiled from DECODE_TREES: nested bit tests, then
+    a mask compare for each candidate template left at the leaf.
+    """
+    namespace: dict[str, object] = {}
+    lines: list[str] = ['def decode(bits):']
+
+    def emit(node: DecodeNode, indent: str) -> None:
+        """Emit code for the subtree at node."""
+        if node.bit is not None:
+            assert node.zero is not None and node.one is not None
+
+            lines.append(f"{indent}if bits & {1 << node.bit:#x}:")
+            emit(node.one, indent + '    ')
+            emit(node.zero, indent)
+            return
+
+        templ: R2InsnTempl
+        for templ in node.templates:
+            name: str = f"t{len(namespace)}"
+            namespace[name] = templ
+
+            lines.append(f"{indent}if (bits & {templ.mask:#x}) == {templ.bits:#x}:")
+            lines.append(f"{indent}    return {name}")
+
+        lines.append(f"{indent}return None")
+
+    emit(DECODE_TREES[length], '    ')
+
+    code = compile('\n'.join(lines) + '\n', f"<decode_len{length}>", 'exec')
+    exec(code, namespace)
+
+    decode = namespace['decode']
+    assert callable(decode)
+
+    return decode
+
+# generated decoders by length
+DECODERS: Final[list[Callable[[int], R2InsnTempl | None]]] = [
+    gen_decoder(length) for length in range(len(INSNS_BY_LEN))
+]
+
 
 class R2Insn:
     """A disassembled instruction."""
+    __slots__ = ('length', 'bits', 'template', 'raw', '_args')
+
     length: int
     bits: int
     template: R2InsnTempl | None
-    args: dict[str, R2Operand] | None
     raw: bytes
+    _args: tuple[int, ...] | None
 
-    def __init__(self, length: int, bits: int, template: R2InsnTempl | None = None, args: dict[str, R2Operand] | None = None):
+    def __init__(self, length: int, bits: int, template: R2InsnTempl | None = None):
         self.template = template
         self.length = length
         self.bits = bits
-        self.args = args
+        self._args = None
 
-    def arg_subst(self, match: re.Match[str]) -> str:
-        arg: str = match.group(2)
+    @property
+    def args(self) -> tuple[int, ...] | None:
+        """Operand values, indexed by template.arg_slot; decoded on first access."""
+        if self._args is None and self.template is not None:
+            self._args = self.template.extract_args(self.bits)
 
-        # for escaping %
-        if arg == '%':
-            return '%'
+        return self._args
+
+    def __str__(self) -> str:
+        if self.template is None:
+            return '*unk*'
 
-        assert arg in VALID_ARGS
         assert self.args is not None
-        assert arg in self.args
 
-        value: int = self.args[arg].value
+        out: list[str] = [f"{self.template.mnemonic:12s} "]
 
-        # XXX: hack
-        if match.group(1) == 'r':
-            # register
-            assert value >= 0
+        literal: str
+        slot: int | None
+        is_reg: bool
+        for (literal, slot, is_reg) in self.template.fmt_parts:
+            out.append(literal)
 
-            return f"r{value:d}"
-        else:
-            return f"{value:#x}"
+            if slot is None:
+                continue
 
-    def __str__(self) -> str:
-        if self.template is None:
-            return '*unk*'
+            value: int = self.args[slot]
+
+            # XXX: hack
+            if is_reg:
+                # register
+                assert value >= 0
 
-        args: str = re.sub(r'(r?)%(.)', self.arg_subst, self.template.args_format)
+                out.append(f"r{value:d}")
+            else:
+                out.append(f"{value:#x}")
 
-        return f"{self.template.mnemonic:12s} {args}"
+        return ''.join(out)
@@ -3,11 +3,12 @@
 
 """MStar Aeon R2 disassembler."""
 
-from struct import unpack
+import sys
+from functools import lru_cache
+from multiprocessing import Pool
 from typing import Final
 
-from filebuffer import FileBuffer
-from insn import R2Insn, INSN_LENGTH_IDX, INSNS
+from insn import R2Insn, R2InsnTempl, DECODERS, INSN_LENGTH_TAB
 
 
 TEST_INPUTS: Final[list[str]] = [
@@ -25,38 +26,43 @@ TEST_INPUTS: Final[list[str]] = [
     'MHAL_HDMI_Set_EnAvMute.bin',
     ]
 
-ZEROES: Final[bytes] = b'\x00' * 4
+# two-digit hex for each byte value
+HEX: Final[tuple[str, ...]] = tuple(f"{b:02x}" for b in range(256))
 
-def dasm_at(fbuf: FileBuffer, offset: int) -> R2Insn:
+# width of the raw bytes column in listings
+HEX_FIELD_WIDTH: Final[int] = 18
+
+# max number of distinct encodings kept by dasm_raw()
+DASM_CACHE_SIZE: Final[int] = 1 << 16
+
+def dasm_at(data: bytes, offset: int) -> R2Insn:
     """Disassemble single instruction at offset."""
     assert offset >= 0
 
-    # insn can be up to 4 bytes long
-    data: bytes = fbuf.read(offset, 4)
+    # top three bits of first byte determine length
+    length: int = INSN_LENGTH_TAB[data[offset]]
 
-    ms_byte: int
-    (ms_byte,) = unpack('B', data[0:1])
+    assert 0 < length <= 4
 
-    # top three bits determine length
-    length_index: int = ms_byte >> 5
+    return dasm_raw(data[offset:offset + length])
 
-    length: int = INSN_LENGTH_IDX[length_index]
 
-    assert 0 < length <= 4
+@lru_cache(maxsize=DASM_CACHE_SIZE)
+def dasm_raw(raw: bytes) -> R2Insn:
+    """Disassemble a single instruction's raw bytes.
 
-    raw: bytes = data[0:length]
+    Results are cached and shared between identical encodings, so they must not be modified.
+    """
+    length: int = len(raw)
 
-    bits: int
-    (bits,) = unpack('>I', ZEROES[0:4 - length] + raw)
+    bits: int = int.from_bytes(raw, 'big')
 
-    for templ in INSNS:
-        if templ.length != length:
-            continue
+    templ: R2InsnTempl | None = DECODERS[length](bits)
 
-        if templ.match(bits):
-            insn: R2Insn = templ.parse(bits)
-            insn.raw = raw
-            return insn
+    if templ is not None:
+        insn: R2Insn = templ.parse(bits)
+        insn.raw = raw
+        return insn
 
     # unknown instruction
     insn = R2Insn(length, bits)
@@ -64,31 +70,84 @@ def dasm_at(fbuf: FileBuffer, offset: int) -> R2Insn:
     return insn
 
 
-def dasm(fbuf: FileBuffer) -> None:
-    """Disassemble entire buffer."""
+def decode_buffer(data: bytes) -> list[tuple[int, R2Insn]]:
+    """Decode every instruction in buffer, returning (offset, insn) pairs."""
+    insns: list[tuple[int, R2Insn]] = []
+
+    # length of an instruction starting at each byte, computed for the whole buffer at once
+    lengths: bytes = bytes(data).translate(INSN_LENGTH_TAB)
+
+    # bind hot lookups to locals
+    decode = dasm_raw
+    append = insns.append
+
     offset: int = 0
+    end: int = len(data)
+
+    while offset < end:
+        length: int = lengths[offset]
+
+        append((offset, decode(data[offset:offset + length])))
+
+        offset += length
+
+    return insns
+
 
-    length: int = len(fbuf)
+def hex_field(raw: bytes) -> str:
+    """Format raw instruction bytes as space-separated hex, padded to HEX_FIELD_WIDTH."""
+    length: int = len(raw)
 
-    while offset < length:
-        insn: R2Insn = dasm_at(fbuf, offset)
+    if length == 2:
+        return f"{HEX[raw[0]]} {HEX[raw[1]]}             "
+    elif length == 3:
+        return f"{HEX[raw[0]]} {HEX[raw[1]]} {HEX[raw[2]]}          "
+    elif length == 4:
+        return f"{HEX[raw[0]]} {HEX[raw[1]]} {HEX[raw[2]]} {HEX[raw[3]]}       "
+    else:
+        # truncated instruction at end of buffer
+        return f"{raw.hex(' '):{HEX_FIELD_WIDTH}s}"
 
-        print(f"{offset:08x}: {insn.raw.hex(' '):18s} {insn}")
 
-        offset += insn.length
+def dasm_listing(data: bytes) -> str:
+    """Disassemble entire buffer into a listing."""
+    out: list[str] = []
+
+    offset: int
+    insn: R2Insn
+
+    for (offset, insn) in decode_buffer(data):
+        out.append(f"{offset:08x}: {hex_field(insn.raw)} {insn}\n")
+
+    return ''.join(out)
+
+
+def dasm(data: bytes) -> None:
+    """Disassemble entire buffer."""
+    # one write for the whole listing rather than a print() per instruction
+    sys.stdout.write(dasm_listing(data))
+
+
+def dasm_file(filename: str) -> str:
+    """Disassemble a file into a listing."""
+    with open(filename, 'rb') as file:
+        data: bytes = file.read()
+
+    return dasm_listing(data)
 
 
 def main() -> None:
     """Entry point."""
+    # files are independent, so disassemble them in parallel and print in order afterwards
+    with Pool() as pool:
+        listings: list[str] = pool.map(dasm_file, TEST_INPUTS)
+
     filename: str
+    listing: str
 
-    for filename in TEST_INPUTS:
+    for (filename, listing) in zip(TEST_INPUTS, listings):
         print(f"*** {filename} ***")
-
-        with open(filename, 'rb') as file:
-            fbuf: FileBuffer = FileBuffer(file)
-            dasm(fbuf)
-
+        sys.stdout.write(listing)
         print("\n")
 
 